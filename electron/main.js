@@ -7,6 +7,7 @@ const __filename = fileURLToPath(import.meta.url)
 const __dirname = path.dirname(__filename)
 
 let mainWindow
+let watcherProcess = null
 
 // Determine if we're in production
 const isDev = process.env.NODE_ENV === 'development'
@@ -19,6 +20,7 @@ function getPythonPaths() {
             pythonCmd: 'python',
             databaseScript: path.join(__dirname, '../python/database.py'),
             parserScript: path.join(__dirname, '../python/fastq_parser.py'),
+            watcherScript: path.join(__dirname, '../python/watch_folder.py'),
             useExe: false
         }
     } else {
@@ -28,6 +30,7 @@ function getPythonPaths() {
             pythonCmd: null, // Not needed for exe
             databaseExe: path.join(resourcePath, 'python', 'database.exe'),
             parserExe: path.join(resourcePath, 'python', 'fastq_parser.exe'),
+            watcherExe: path.join(resourcePath, 'python', 'watch_folder.exe'),
             useExe: true
         }
     }
@@ -35,8 +38,9 @@ function getPythonPaths() {
 
 const pythonPaths = getPythonPaths()
 
-// Helper to run Python DB script
-function runDbOp(args) {
+// Helper to run Python DB script. `input` is written to its stdin, for
+// payloads too large for a command-line argument (e.g. `--results -`)
+function runDbOp(args, input) {
     return new Promise((resolve, reject) => {
         let pythonProcess
 
@@ -48,6 +52,13 @@ function runDbOp(args) {
             pythonProcess = spawn(pythonPaths.pythonCmd, [pythonPaths.databaseScript, ...args])
         }
 
+        if (input !== undefined) {
+            pythonProcess.stdin.on('error', (err) => {
+                console.error("Failed to write DB input:", err)
+            })
+            pythonProcess.stdin.end(input)
+        }
+
         let dataString = ''
         let errorString = ''
 
@@ -122,16 +133,19 @@ app.whenReady().then(() => {
     })
 
     // Analysis Handler
-    ipcMain.handle('analyze-file', async (event, filePath, sampleId) => {
+    ipcMain.handle('analyze-file', async (event, filePath, sampleId, options = {}) => {
         return new Promise((resolve, reject) => {
             let pythonProcess
 
+            const args = [filePath]
+            if (options.maxMemory) args.push('--max_memory', options.maxMemory.toString())
+
             if (pythonPaths.useExe) {
                 // Production: run exe directly
-                pythonProcess = spawn(pythonPaths.parserExe, [filePath])
+                pythonProcess = spawn(pythonPaths.parserExe, args)
             } else {
                 // Development: run python script
-                pythonProcess = spawn(pythonPaths.pythonCmd, [pythonPaths.parserScript, filePath])
+                pythonProcess = spawn(pythonPaths.pythonCmd, [pythonPaths.parserScript, ...args])
             }
 
             let dataString = ''
@@ -166,10 +180,12 @@ app.whenReady().then(() => {
 
                         // SAVE TO DB (UPDATE SAMPLE)
                         try {
+                            // Results go over stdin: per-tile data can exceed
+                            // the OS limit for a single argument/command line
                             const saveRes = await runDbOp(['update_sample',
                                 '--sample_id', sampleId.toString(),
-                                '--results', JSON.stringify(result)
-                            ])
+                                '--results', '-'
+                            ], JSON.stringify(result))
 
                             if (saveRes.status === 'success') {
                                 resolve({ status: 'success', data: saveRes.data })
@@ -193,6 +209,10 @@ app.whenReady().then(() => {
         return await runDbOp(['get_projects'])
     })
 
+    ipcMain.handle('db-get-sample', async (event, sampleId) => {
+        return await runDbOp(['get_sample', '--sample_id', sampleId.toString()])
+    })
+
     ipcMain.handle('db-create-project', async (event, name) => {
         return await runDbOp(['create_project', '--name', name])
     })
@@ -212,8 +232,98 @@ app.whenReady().then(() => {
     ipcMain.handle('db-delete-sample', async (event, sampleId) => {
         return await runDbOp(['delete_sample', '--sample_id', sampleId.toString()])
     })
+
+    // Watch Folder Handlers
+    ipcMain.handle('watch-start', async (event, projectId, folders, options = {}) => {
+        if (watcherProcess) {
+            return { status: 'error', message: 'Watch folder is already running' }
+        }
+
+        const args = [...folders, '--project_id', projectId.toString()]
+        if (options.stableSeconds) args.push('--stable_seconds', options.stableSeconds.toString())
+        if (options.marker) args.push('--marker', options.marker)
+        if (options.interval) args.push('--interval', options.interval.toString())
+        if (options.analyze === false) args.push('--no_analyze')
+        if (options.maxMemory) args.push('--max_memory', options.maxMemory.toString())
+
+        if (pythonPaths.useExe) {
+            watcherProcess = spawn(pythonPaths.watcherExe, args)
+        } else {
+            watcherProcess = spawn(pythonPaths.pythonCmd, [pythonPaths.watcherScript, ...args])
+        }
+
+        let analyzingSampleId = null
+        let pending = ''
+
+        watcherProcess.stdout.on('data', (data) => {
+            // Lines can be split across chunks; keep the trailing partial line
+            pending += data.toString()
+            const lines = pending.split('\n')
+            pending = lines.pop()
+
+            for (const line of lines) {
+                if (line.startsWith('WATCH:')) {
+                    try {
+                        const watchEvent = JSON.parse(line.slice('WATCH:'.length))
+                        if (watchEvent.event === 'analyzing') analyzingSampleId = watchEvent.sample_id
+                        if (mainWindow) mainWindow.webContents.send('watch-event', watchEvent)
+                    } catch (e) {
+                        console.error('Failed to parse watcher event:', line)
+                    }
+                } else if (line.startsWith('PROGRESS:') && analyzingSampleId !== null) {
+                    const progress = parseInt(line.split(':')[1].trim())
+                    if (mainWindow) {
+                        mainWindow.webContents.send('analysis-progress', { sampleId: analyzingSampleId, progress })
+                    }
+                }
+            }
+        })
+
+        watcherProcess.stderr.on('data', (data) => {
+            console.error(`Watcher: ${data}`)
+        })
+
+        watcherProcess.on('close', (code) => {
+            watcherProcess = null
+            if (mainWindow) mainWindow.webContents.send('watch-event', { event: 'stopped', code })
+        })
+
+        return { status: 'success', message: `Watching ${folders.length} folder(s)` }
+    })
+
+    ipcMain.handle('watch-stop', async () => {
+        if (!watcherProcess) {
+            return { status: 'error', message: 'Watch folder is not running' }
+        }
+        watcherProcess.kill()
+        return { status: 'success', message: 'Watch folder stopped' }
+    })
+
+    ipcMain.handle('db-query-samples', async (event, projectId, query = {}) => {
+        const args = ['query_samples', '--project_id', projectId.toString()]
+        const optionFlags = {
+            status: '--status',
+            platform: '--platform',
+            minReads: '--min_reads',
+            maxReads: '--max_reads',
+            minGc: '--min_gc',
+            maxGc: '--max_gc',
+            search: '--search',
+            sort: '--sort',
+            order: '--order',
+            limit: '--limit',
+            cursor: '--cursor'
+        }
+        for (const [key, flag] of Object.entries(optionFlags)) {
+            if (query[key] !== undefined && query[key] !== null && query[key] !== '') {
+                args.push(flag, query[key].toString())
+            }
+        }
+        return await runDbOp(args)
+    })
 })
 
 app.on('window-all-closed', function () {
+    if (watcherProcess) watcherProcess.kill()
     if (process.platform !== 'darwin') app.quit()
 })
@@ -2,12 +2,21 @@ const { contextBridge, ipcRenderer, webUtils } = require('electron')
 
 contextBridge.exposeInMainWorld('electronAPI', {
     getPathForFile: (file) => webUtils.getPathForFile(file),
-    analyzeFile: (filePath, sampleId) => ipcRenderer.invoke('analyze-file', filePath, sampleId),
+    analyzeFile: (filePath, sampleId, options) => ipcRenderer.invoke('analyze-file', filePath, sampleId, options),
     getProjects: () => ipcRenderer.invoke('db-get-projects'),
+    getSample: (sampleId) => ipcRenderer.invoke('db-get-sample', sampleId),
     createProject: (name) => ipcRenderer.invoke('db-create-project', name),
     addSample: (projectId, filename, filepath) => ipcRenderer.invoke('db-add-sample', projectId, filename, filepath),
     deleteProject: (projectId) => ipcRenderer.invoke('db-delete-project', projectId),
     deleteSample: (sampleId) => ipcRenderer.invoke('db-delete-sample', sampleId),
+    querySamples: (projectId, query) => ipcRenderer.invoke('db-query-samples', projectId, query),
+    startWatch: (projectId, folders, options) => ipcRenderer.invoke('watch-start', projectId, folders, options),
+    stopWatch: () => ipcRenderer.invoke('watch-stop'),
+    onWatchEvent: (callback) => {
+        const subscription = (event, value) => callback(value)
+        ipcRenderer.on('watch-event', subscription)
+        return () => ipcRenderer.removeListener('watch-event', subscription)
+    },
     onAnalysisProgress: (callback) => {
         const subscription = (event, value) => callback(value)
         ipcRenderer.on('analysis-progress', subscription)
@@ -21,6 +21,24 @@ def get_db_path():
 
 DB_PATH = get_db_path()
 
+# Denormalized summary columns on the samples table (name -> SQL type)
+SUMMARY_COLUMNS = {
+    "qc_status": "TEXT",
+    "platform": "TEXT",
+    "total_reads": "INTEGER",
+    "total_bases": "INTEGER",
+    "gc_content": "REAL",
+    "avg_q_score": "REAL",
+}
+
+# Columns returned for list views (everything except the analysis_results JSON)
+SAMPLE_LIST_COLUMNS = ('id', 'project_id', 'filename', 'filepath', 'upload_date', *SUMMARY_COLUMNS)
+
+# Columns query_samples may sort by
+SORTABLE_COLUMNS = ("upload_date", "filename", "total_reads", "gc_content", "avg_q_score")
+# Largest page query_samples returns in one call
+MAX_PAGE_SIZE = 1000
+
 def get_db_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
@@ -52,10 +70,116 @@ def init_db():
         )
     ''')
     
+    # Summary columns copied out of analysis_results so lists can be
+    # filtered/sorted in SQL without parsing every JSON blob
+    existing = [row['name'] for row in c.execute('PRAGMA table_info(samples)').fetchall()]
+    for column, col_type in SUMMARY_COLUMNS.items():
+        if column not in existing:
+            c.execute(f'ALTER TABLE samples ADD COLUMN {column} {col_type}')
+    
+    # Backfill summaries for rows created before the columns existed
+    stale = c.execute('SELECT id, analysis_results FROM samples WHERE qc_status IS NULL').fetchall()
+    for row in stale:
+        summary = extract_summary(row['analysis_results'])
+        c.execute(f'UPDATE samples SET {", ".join(f"{k} = ?" for k in summary)} WHERE id = ?',
+                  (*summary.values(), row['id']))
+    
+    # Indexes for the sample list queries
+    c.execute('CREATE INDEX IF NOT EXISTS idx_samples_project_upload ON samples (project_id, upload_date)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_samples_project_filepath ON samples (project_id, filepath)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_samples_project_status ON samples (project_id, qc_status)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_samples_project_platform ON samples (project_id, platform)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_samples_project_reads ON samples (project_id, total_reads)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_samples_project_gc ON samples (project_id, gc_content)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_samples_project_quality ON samples (project_id, avg_q_score)')
+    
+    # Trigram full-text index over filenames (external content table kept in
+    # sync by triggers) so search keeps substring semantics
+    if fts_available(conn):
+        fts_table = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'samples_fts'").fetchone()
+        c.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS samples_fts USING fts5 (
+                filename, content='samples', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS samples_fts_insert AFTER INSERT ON samples BEGIN
+                INSERT INTO samples_fts (rowid, filename) VALUES (new.id, new.filename);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS samples_fts_delete AFTER DELETE ON samples BEGIN
+                INSERT INTO samples_fts (samples_fts, rowid, filename) VALUES ('delete', old.id, old.filename);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS samples_fts_update AFTER UPDATE OF filename ON samples BEGIN
+                INSERT INTO samples_fts (samples_fts, rowid, filename) VALUES ('delete', old.id, old.filename);
+                INSERT INTO samples_fts (rowid, filename) VALUES (new.id, new.filename);
+            END
+        ''')
+        if not fts_table:
+            c.execute("INSERT INTO samples_fts (samples_fts) VALUES ('rebuild')")
+    
     conn.commit()
     conn.close()
     return {"status": "success", "message": "Database initialized"}
 
+def fts_available(conn):
+    """Return True if this SQLite build includes FTS5 with the trigram tokenizer (3.34+)."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5 (x, tokenize='trigram')")
+        conn.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def extract_summary(analysis_results):
+    """
+    Pull the list-view summary fields out of an analysis result.
+    Accepts a dict, a JSON string or None (not analyzed yet).
+    """
+    summary = {column: None for column in SUMMARY_COLUMNS}
+    if isinstance(analysis_results, str):
+        try:
+            analysis_results = json.loads(analysis_results)
+        except (ValueError, TypeError):
+            analysis_results = None
+    
+    if not analysis_results:
+        summary["qc_status"] = "pending"
+        return summary
+    if "error" in analysis_results:
+        summary["qc_status"] = "error"
+        return summary
+    
+    summary["qc_status"] = (analysis_results.get("quality_status") or {}).get("overall", "pending")
+    summary["platform"] = analysis_results.get("platform")
+    summary["total_reads"] = analysis_results.get("total_reads")
+    summary["total_bases"] = analysis_results.get("total_bases")
+    summary["gc_content"] = analysis_results.get("gc_content")
+    summary["avg_q_score"] = analysis_results.get("avg_q_score")
+    return summary
+
+def summary_results(sample):
+    """
+    Compact stand-in for analysis_results built from the summary columns,
+    so list views don't need the full JSON. None while not analyzed.
+    """
+    if sample['qc_status'] in (None, 'pending'):
+        return None
+    if sample['qc_status'] == 'error':
+        return {"error": "Analysis failed", "summary_only": True}
+    return {
+        "platform": sample['platform'],
+        "total_reads": sample['total_reads'],
+        "total_bases": sample['total_bases'],
+        "gc_content": sample['gc_content'],
+        "avg_q_score": sample['avg_q_score'],
+        "quality_status": {"overall": sample['qc_status']},
+        "summary_only": True
+    }
+
 def create_project(name):
     conn = get_db_connection()
     c = conn.cursor()
@@ -78,17 +202,12 @@ def get_projects():
         project_list = []
         for p in projects:
             p_dict = dict(p)
-            # Get samples for this project
-            samples = c.execute('SELECT * FROM samples WHERE project_id = ? ORDER BY upload_date DESC', (p['id'],)).fetchall()
+            # Get samples for this project (summary columns only; full results via get_sample)
+            samples = c.execute(f'SELECT {", ".join(SAMPLE_LIST_COLUMNS)} FROM samples WHERE project_id = ? ORDER BY upload_date DESC',
+                                (p['id'],)).fetchall()
             p_dict['samples'] = [dict(s) for s in samples]
-            # Parse JSON results if needed, but for list view maybe not strictly necessary yet
-            # Let's keep it simple for now
             for s in p_dict['samples']:
-                if s['analysis_results']:
-                    try:
-                        s['analysis_results'] = json.loads(s['analysis_results'])
-                    except:
-                        pass
+                s['analysis_results'] = summary_results(s)
             project_list.append(p_dict)
         conn.close()
         return {"status": "success", "data": project_list}
@@ -96,6 +215,25 @@ def get_projects():
         conn.close()
         return {"status": "error", "message": str(e)}
 
+def get_sample(sample_id):
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        sample = c.execute('SELECT * FROM samples WHERE id = ?', (sample_id,)).fetchone()
+        conn.close()
+        if sample is None:
+            return {"status": "error", "message": f"Sample {sample_id} not found"}
+        sample_dict = dict(sample)
+        if sample_dict['analysis_results']:
+            try:
+                sample_dict['analysis_results'] = json.loads(sample_dict['analysis_results'])
+            except:
+                pass
+        return {"status": "success", "data": sample_dict}
+    except Exception as e:
+        conn.close()
+        return {"status": "error", "message": str(e)}
+
 def delete_project(project_id):
     conn = get_db_connection()
     c = conn.cursor()
@@ -117,8 +255,10 @@ def add_sample(project_id, filename, filepath, analysis_results):
         if isinstance(analysis_results, dict):
             analysis_results = json.dumps(analysis_results)
             
-        c.execute('INSERT INTO samples (project_id, filename, filepath, analysis_results, upload_date) VALUES (?, ?, ?, ?, ?)',
-                  (project_id, filename, filepath, analysis_results, upload_date))
+        summary = extract_summary(analysis_results)
+        c.execute(f'INSERT INTO samples (project_id, filename, filepath, analysis_results, upload_date, {", ".join(summary)}) '
+                  f'VALUES (?, ?, ?, ?, ?, {", ".join("?" for _ in summary)})',
+                  (project_id, filename, filepath, analysis_results, upload_date, *summary.values()))
         conn.commit()
         sample_id = c.lastrowid
         conn.close()
@@ -130,13 +270,72 @@ def add_sample(project_id, filename, filepath, analysis_results):
             "filename": filename,
             "filepath": filepath,
             "analysis_results": json.loads(analysis_results) if analysis_results else None,
-            "upload_date": upload_date
+            "upload_date": upload_date,
+            **summary
         }
         return {"status": "success", "data": new_sample}
     except Exception as e:
         conn.close()
         return {"status": "error", "message": str(e)}
 
+def add_samples(project_id, filepaths):
+    """
+    Register several files in one transaction, skipping paths already in the project.
+    Returns the newly created samples (without analysis results).
+    """
+    conn = get_db_connection()
+    c = conn.cursor()
+    upload_date = datetime.now().isoformat()
+    try:
+        existing = set()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(filepaths), 500):
+            chunk = filepaths[start:start + 500]
+            rows = c.execute(f'SELECT filepath FROM samples WHERE project_id = ? AND filepath IN ({", ".join("?" for _ in chunk)})',
+                             (project_id, *chunk)).fetchall()
+            existing.update(r['filepath'] for r in rows)
+        
+        summary = extract_summary(None)
+        new_samples = []
+        for filepath in filepaths:
+            if filepath in existing:
+                continue
+            existing.add(filepath)
+            filename = os.path.basename(filepath)
+            c.execute(f'INSERT INTO samples (project_id, filename, filepath, analysis_results, upload_date, {", ".join(summary)}) '
+                      f'VALUES (?, ?, ?, ?, ?, {", ".join("?" for _ in summary)})',
+                      (project_id, filename, filepath, None, upload_date, *summary.values()))
+            new_samples.append({
+                "id": c.lastrowid,
+                "project_id": project_id,
+                "filename": filename,
+                "filepath": filepath,
+                "analysis_results": None,
+                "upload_date": upload_date,
+                **summary
+            })
+        conn.commit()
+        conn.close()
+        return {"status": "success", "data": new_samples}
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return {"status": "error", "message": str(e)}
+
+def get_pending_samples(project_id):
+    """Samples in the project that were registered but never analyzed, oldest first."""
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        rows = c.execute(f'SELECT {", ".join(SAMPLE_LIST_COLUMNS)} FROM samples '
+                         'WHERE project_id = ? AND qc_status = ? ORDER BY id',
+                         (project_id, 'pending')).fetchall()
+        conn.close()
+        return {"status": "success", "data": [dict(r) for r in rows]}
+    except Exception as e:
+        conn.close()
+        return {"status": "error", "message": str(e)}
+
 def delete_sample(sample_id):
     conn = get_db_connection()
     c = conn.cursor()
@@ -157,7 +356,9 @@ def update_sample(sample_id, analysis_results):
         if isinstance(analysis_results, dict):
             analysis_results = json.dumps(analysis_results)
             
-        c.execute('UPDATE samples SET analysis_results = ? WHERE id = ?', (analysis_results, sample_id))
+        summary = extract_summary(analysis_results)
+        c.execute(f'UPDATE samples SET analysis_results = ?, {", ".join(f"{k} = ?" for k in summary)} WHERE id = ?',
+                  (analysis_results, *summary.values(), sample_id))
         conn.commit()
         
         # Get updated sample
@@ -175,17 +376,123 @@ def update_sample(sample_id, analysis_results):
         conn.close()
         return {"status": "error", "message": str(e)}
 
+def _fts_query(text):
+    """Quote the search text as one FTS5 phrase; with the trigram tokenizer this is a substring match."""
+    return '"' + text.replace('"', '""') + '"'
+
+def _keyset_clause(column, descending, last_value, last_id):
+    """
+    WHERE clause selecting rows strictly after (last_value, last_id) in
+    ORDER BY column, id. SQLite sorts NULLs first ascending and last
+    descending, so NULL summary values (pending samples) need their own branch.
+    """
+    if descending:
+        if last_value is None:
+            return f'({column} IS NULL AND id < ?)', [last_id]
+        return f'({column} < ? OR ({column} = ? AND id < ?) OR {column} IS NULL)', [last_value, last_value, last_id]
+    if last_value is None:
+        return f'(({column} IS NULL AND id > ?) OR {column} IS NOT NULL)', [last_id]
+    return f'({column} > ? OR ({column} = ? AND id > ?))', [last_value, last_value, last_id]
+
+def query_samples(project_id, status=None, platform=None, min_reads=None, max_reads=None,
+                  min_gc=None, max_gc=None, search=None, sort='upload_date', order='desc',
+                  limit=50, cursor=None):
+    """
+    Filtered, sorted page of a project's samples using keyset pagination.
+    Returns summary columns only; `cursor` is the `next_cursor` of the previous page.
+    `search` is a case-insensitive substring match on the filename.
+    """
+    if sort not in SORTABLE_COLUMNS:
+        return {"status": "error", "message": f"Cannot sort by {sort}"}
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return {"status": "error", "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}
+    descending = order.lower() == 'desc'
+    direction = 'DESC' if descending else 'ASC'
+    
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        where = ['project_id = ?']
+        params = [project_id]
+        
+        if status:
+            where.append('qc_status = ?')
+            params.append(status)
+        if platform:
+            where.append('platform = ?')
+            params.append(platform)
+        if min_reads is not None:
+            where.append('total_reads >= ?')
+            params.append(min_reads)
+        if max_reads is not None:
+            where.append('total_reads <= ?')
+            params.append(max_reads)
+        if min_gc is not None:
+            where.append('gc_content >= ?')
+            params.append(min_gc)
+        if max_gc is not None:
+            where.append('gc_content <= ?')
+            params.append(max_gc)
+        if search and search.strip():
+            has_fts = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'samples_fts'").fetchone()
+            # Trigrams need at least 3 characters; shorter terms use LIKE
+            if has_fts and len(search) >= 3:
+                where.append('id IN (SELECT rowid FROM samples_fts WHERE samples_fts MATCH ?)')
+                params.append(_fts_query(search))
+            else:
+                where.append("filename LIKE ? ESCAPE '\\'")
+                escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(f'%{escaped}%')
+        if cursor:
+            last_value, last_id = json.loads(cursor)
+            clause, clause_params = _keyset_clause(sort, descending, last_value, last_id)
+            where.append(clause)
+            params.extend(clause_params)
+        
+        rows = c.execute(
+            f'SELECT {", ".join(SAMPLE_LIST_COLUMNS)} FROM samples WHERE {" AND ".join(where)} '
+            f'ORDER BY {sort} {direction}, id {direction} LIMIT ?',
+            (*params, limit + 1)
+        ).fetchall()
+        conn.close()
+        
+        samples = [dict(r) for r in rows[:limit]]
+        for s in samples:
+            s['analysis_results'] = summary_results(s)
+        next_cursor = None
+        if len(rows) > limit:
+            last = samples[-1]
+            next_cursor = json.dumps([last[sort], last['id']])
+        return {"status": "success", "data": {"samples": samples, "next_cursor": next_cursor}}
+    except Exception as e:
+        conn.close()
+        return {"status": "error", "message": str(e)}
+
 def main():
     parser = argparse.ArgumentParser(description='OmniQC Database Manager')
-    parser.add_argument('action', choices=['init', 'create_project', 'get_projects', 'delete_project', 'add_sample', 'update_sample', 'delete_sample'])
+    parser.add_argument('action', choices=['init', 'create_project', 'get_projects', 'delete_project', 'add_sample', 'update_sample', 'delete_sample', 'query_samples', 'add_samples', 'get_sample'])
     parser.add_argument('--name', help='Project name')
     parser.add_argument('--project_id', type=int, help='Project ID')
     parser.add_argument('--sample_id', type=int, help='Sample ID')
     parser.add_argument('--filename', help='Sample filename')
     parser.add_argument('--filepath', help='Sample filepath')
-    parser.add_argument('--results', help='Analysis results JSON string')
+    parser.add_argument('--results', help='Analysis results JSON string, or - to read it from stdin')
+    parser.add_argument('--filepaths', help='JSON list of file paths (add_samples)')
+    parser.add_argument('--status', help='Filter by QC status (pass, warn, fail, pending, error)')
+    parser.add_argument('--platform', help='Filter by sequencing platform')
+    parser.add_argument('--min_reads', type=int, help='Minimum total reads')
+    parser.add_argument('--max_reads', type=int, help='Maximum total reads')
+    parser.add_argument('--min_gc', type=float, help='Minimum GC content (%%)')
+    parser.add_argument('--max_gc', type=float, help='Maximum GC content (%%)')
+    parser.add_argument('--search', help='Filename text search')
+    parser.add_argument('--sort', default='upload_date', choices=SORTABLE_COLUMNS, help='Sort column')
+    parser.add_argument('--order', default='desc', choices=['asc', 'desc'], help='Sort order')
+    parser.add_argument('--limit', type=int, default=50, help='Page size')
+    parser.add_argument('--cursor', help='Cursor returned by the previous page')
 
     args = parser.parse_args()
+    if args.results == '-':
+        args.results = sys.stdin.buffer.read().decode('utf-8')
     
     result = {"status": "error", "message": "Invalid action"}
 
@@ -198,6 +505,11 @@ def main():
             result = {"status": "error", "message": "Missing --name"}
     elif args.action == 'get_projects':
         result = get_projects()
+    elif args.action == 'get_sample':
+        if args.sample_id:
+            result = get_sample(args.sample_id)
+        else:
+            result = {"status": "error", "message": "Missing --sample_id"}
     elif args.action == 'delete_project':
         if args.project_id:
             result = delete_project(args.project_id)
@@ -220,6 +532,20 @@ def main():
             result = delete_sample(args.sample_id)
         else:
             result = {"status": "error", "message": "Missing --sample_id"}
+    elif args.action == 'add_samples':
+        if args.project_id and args.filepaths:
+            result = add_samples(args.project_id, json.loads(args.filepaths))
+        else:
+            result = {"status": "error", "message": "Missing arguments for add_samples"}
+    elif args.action == 'query_samples':
+        if args.project_id:
+            result = query_samples(args.project_id, status=args.status, platform=args.platform,
+                                   min_reads=args.min_reads, max_reads=args.max_reads,
+                                   min_gc=args.min_gc, max_gc=args.max_gc, search=args.search,
+                                   sort=args.sort, order=args.order, limit=args.limit,
+                                   cursor=args.cursor)
+        else:
+            result = {"status": "error", "message": "Missing --project_id"}
 
     print(json.dumps(result))
 
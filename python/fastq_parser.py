@@ -1,9 +1,34 @@
-from Bio import SeqIO
+import argparse
 import gzip
-import os
-import sys
 import json
 import math
+import os
+import queue
+import sys
+import threading
+
+import numpy as np
+from Bio import SeqIO
+
+from memory_governor import (MemoryGovernor, DEFAULT_LIMITS, DUPLICATION_ENTRY_OVERHEAD,
+                             RSS_CHECK_INTERVAL, parse_size)
+
+# Adapter sequences (simplified)
+ADAPTERS = {
+    "Illumina Universal": "AGATCGGAAGAG",
+    "Nextera": "CTGTCTCTTATA",
+    "Small RNA": "TGGAATTCTCGG"
+}
+
+# Defaults for the pass-through filter mode (see analyze_fastq)
+DEFAULT_FILTER_SETTINGS = {
+    "quality_cutoff": 20,        # 3' quality trimming threshold (BWA-style running sum)
+    "adapter_trimming": True,    # Clip reads at the first adapter occurrence
+    "adapter_min_overlap": 3,    # Shortest adapter prefix clipped at the 3' end
+    "min_length": 20,            # Drop reads shorter than this after trimming
+    "max_n": 5,                  # Drop reads with more N bases than this
+    "compress_level": 6          # gzip level for the filtered output
+}
 
 def parse_fastq(file_path):
     """
@@ -21,8 +46,18 @@ def parse_fastq(file_path):
     finally:
         handle.close()
 
-def analyze_fastq(file_path):
-    stats = {
+def new_stats(limits=None):
+    """
+    Empty accumulator for accumulate_record / finalize_stats.
+    limits caps its size (see memory_governor.DEFAULT_LIMITS).
+    """
+    limits = dict(limits or DEFAULT_LIMITS)
+    positions = limits["max_positions"]
+    return {
+        "limits": limits,
+        "limits_hit": {},  # metric -> read number at which its limit was reached
+        "duplication_bytes": 0,
+        "dropped_singletons": 0,  # singletons the memory governor removed from sequence_duplication
         "total_reads": 0,
         "total_bases": 0,
         "gc_count": 0,
@@ -38,15 +73,375 @@ def analyze_fastq(file_path):
         "per_base_content": {},
         "sequence_duplication": {},
         "adapter_content": {},
-        "read_lengths": []  # For N50 calculation
+        "read_lengths": [],  # For N50 calculation
+        # Per-tile quality: "lane:tile" -> row in the arrays below
+        "tile_index": {},
+        "tile_quality_sum": np.zeros((16, positions), dtype=np.int64),
+        "tile_length_counts": np.zeros((16, positions + 1), dtype=np.int64),
+        "tile_pending": {},  # (row, length) -> list of quality rows as bytes
+        "tile_pending_reads": 0
     }
+
+def parse_read_header(header):
+    """
+    Split an Illumina or MGI read name into (flowcell, lane, tile, x, y).
+    Uses plain str.split/slicing rather than a regex since it runs once per read.
+    Returns None for headers that carry no tile information.
+    """
+    name = header.split(" ", 1)[0]
+    fields = name.split(":")
+    if len(fields) >= 7:
+        # Casava 1.8+: instrument:run:flowcell:lane:tile:x:y
+        lane, tile = fields[3], fields[4]
+        if lane.isdigit() and tile.isdigit():
+            return fields[2], lane, tile, fields[5], fields[6]
+        return None
+    if len(fields) == 5:
+        # Older Illumina: instrument:lane:tile:x:y#index/read
+        lane, tile = fields[1], fields[2]
+        if lane.isdigit() and tile.isdigit():
+            return None, lane, tile, fields[3], fields[4].split("#", 1)[0]
+        return None
+    if len(fields) == 1:
+        # MGI/DNBSEQ: {flowcell}L{lane}C{col:3}R{row:3}{read_id}[/1]
+        name = name.split("/", 1)[0]
+        pos = name.rfind("L")
+        if pos > 0 and len(name) >= pos + 10 and name[pos + 2] == "C" and name[pos + 6] == "R":
+            lane = name[pos + 1]
+            tile = name[pos + 2:pos + 10]
+            if lane.isdigit():
+                return name[:pos], lane, tile, None, None
+    return None
+
+def _add_tile(stats, tile):
+    """Assign the next row to a new tile key, growing the arrays when full."""
+    row = len(stats["tile_index"])
+    if row >= stats["limits"]["max_tiles"]:
+        if "tiles" not in stats["limits_hit"]:
+            stats["limits_hit"]["tiles"] = stats["total_reads"]
+        return None
+    if row >= stats["tile_quality_sum"].shape[0]:
+        for key in ("tile_quality_sum", "tile_length_counts"):
+            grown = np.zeros((row * 2, stats[key].shape[1]), dtype=np.int64)
+            grown[:row] = stats[key]
+            stats[key] = grown
+    stats["tile_index"][tile] = row
+    return row
+
+def _flush_tile_batches(stats):
+    """Sum the buffered quality rows into the per-tile arrays."""
+    for (row, n), batch in stats["tile_pending"].items():
+        if n:
+            block = np.frombuffer(b"".join(batch), dtype=np.uint8).reshape(len(batch), n)
+            stats["tile_quality_sum"][row, :n] += block.sum(axis=0, dtype=np.int64)
+        stats["tile_length_counts"][row, n] += len(batch)
+    stats["tile_pending"] = {}
+    stats["tile_pending_reads"] = 0
+
+def accumulate_record(stats, seq, qualities, tile=None):
+    """
+    Add one read (sequence string and phred quality list) to the stats accumulator.
+    tile is the read's "lane:tile" key, or None if the header has none.
+    """
+    limits = stats["limits"]
+    positions = limits["max_positions"]
+    stats["total_reads"] += 1
+    seq_len = len(seq)
+    stats["total_bases"] += seq_len
     
-    # Adapter sequences (simplified)
-    adapters = {
-        "Illumina Universal": "AGATCGGAAGAG",
-        "Nextera": "CTGTCTCTTATA",
-        "Small RNA": "TGGAATTCTCGG"
-    }
+    # Length stats
+    if seq_len < stats["min_len"]: stats["min_len"] = seq_len
+    if seq_len > stats["max_len"]: stats["max_len"] = seq_len
+    
+    len_bin = (seq_len // 10) * 10
+    stats["length_distribution"][len_bin] = stats["length_distribution"].get(len_bin, 0) + 1
+    
+    # Collect read lengths for N50 (limited for memory)
+    if len(stats["read_lengths"]) < limits["max_read_lengths"]:
+        stats["read_lengths"].append(seq_len)
+    elif "read_lengths" not in stats["limits_hit"]:
+        stats["limits_hit"]["read_lengths"] = stats["total_reads"]
+
+    # GC Content
+    gc_count = seq.count("G") + seq.count("C")
+    stats["gc_count"] += gc_count
+
+    # Quality Scores
+    stats["q_score_sum"] += sum(qualities)
+
+    # Per position quality (limit to first max_positions bp for performance/size)
+    for i, q in enumerate(qualities[:positions]):
+        stats["quality_distribution"][i] = stats["quality_distribution"].get(i, 0) + q
+        stats["quality_counts"][i] = stats["quality_counts"].get(i, 0) + 1
+    
+    # Per tile quality: reads are buffered as bytes per (tile, length) and summed
+    # in batches, which is far cheaper than a numpy add per read. Per-position
+    # counts are recovered from the per-tile length histogram in finalize_stats
+    if tile is not None:
+        row = stats["tile_index"].get(tile)
+        if row is None:
+            row = _add_tile(stats, tile)
+        if row is not None:
+            n = min(len(qualities), positions)
+            batch = stats["tile_pending"].get((row, n))
+            if batch is None:
+                batch = stats["tile_pending"][(row, n)] = []
+            batch.append(bytes(qualities if n == len(qualities) else qualities[:n]))
+            stats["tile_pending_reads"] += 1
+            if stats["tile_pending_reads"] >= limits["tile_batch_size"]:
+                _flush_tile_batches(stats)
+    
+    # --- New Metrics Calculation ---
+    
+    # Per Sequence Quality
+    if len(qualities) > 0:
+        mean_q = int(sum(qualities) / len(qualities))
+        stats["per_sequence_quality"][mean_q] = stats["per_sequence_quality"].get(mean_q, 0) + 1
+
+    # Per Sequence GC
+    if seq_len > 0:
+        gc_pct = int((gc_count / seq_len) * 100)
+        stats["per_sequence_gc"][gc_pct] = stats["per_sequence_gc"].get(gc_pct, 0) + 1
+
+    # Per Base Content (limit to first max_positions bp)
+    seq_str = seq.upper()
+    for i, char in enumerate(seq_str[:positions]):
+        if i not in stats["per_base_content"]:
+            stats["per_base_content"][i] = {'A':0, 'T':0, 'G':0, 'C':0, 'N':0}
+        if char in stats["per_base_content"][i]:
+            stats["per_base_content"][i][char] += 1
+    
+    # Duplication (limit memory usage: track unique sequences up to the count/byte limits)
+    # If we have too many unique sequences, stop tracking to avoid OOM
+    duplication = stats["sequence_duplication"]
+    count = duplication.get(seq_str)
+    if count is not None:
+        # Still count if we already tracking it
+        duplication[seq_str] = count + 1
+    elif len(duplication) < limits["max_unique_sequences"] and (
+            limits["max_duplication_bytes"] is None or stats["duplication_bytes"] < limits["max_duplication_bytes"]):
+        duplication[seq_str] = 1
+        stats["duplication_bytes"] += seq_len + DUPLICATION_ENTRY_OVERHEAD
+    elif "sequence_duplication" not in stats["limits_hit"]:
+        stats["limits_hit"]["sequence_duplication"] = stats["total_reads"]
+    
+    # Adapter Content (check the first reads only for speed)
+    if stats["total_reads"] <= limits["adapter_sample_reads"]:
+        for name, adapter in ADAPTERS.items():
+            if adapter in seq_str:
+                stats["adapter_content"][name] = stats["adapter_content"].get(name, 0) + 1
+
+# ============================================
+# PASS-THROUGH FILTERING
+# ============================================
+
+def quality_trim_end(qualities, cutoff):
+    """
+    Return the length to keep after 3' quality trimming.
+    Same running-sum algorithm as BWA/cutadapt: cut where sum(cutoff - q) from the end is maximal.
+    """
+    running = 0
+    best = 0
+    keep = len(qualities)
+    for i in range(len(qualities) - 1, -1, -1):
+        running += cutoff - qualities[i]
+        if running < 0:
+            break
+        if running > best:
+            best = running
+            keep = i
+    return keep
+
+def find_adapter(seq_str, min_overlap):
+    """
+    Return the position where an adapter starts, or None.
+    Full adapter matches anywhere in the read win; otherwise a partial adapter
+    prefix of at least min_overlap bases hanging off the 3' end is clipped.
+    """
+    best = None
+    for adapter in ADAPTERS.values():
+        pos = seq_str.find(adapter)
+        if pos != -1 and (best is None or pos < best):
+            best = pos
+    if best is not None:
+        return best
+    
+    seq_len = len(seq_str)
+    for adapter in ADAPTERS.values():
+        for k in range(min(len(adapter) - 1, seq_len), min_overlap - 1, -1):
+            if seq_str.endswith(adapter[:k]):
+                pos = seq_len - k
+                if best is None or pos < best:
+                    best = pos
+                break
+    return best
+
+def filter_record(seq, qualities, settings, summary):
+    """
+    Apply adapter clipping, quality trimming and length/N filters to one read.
+    Returns the kept length, or None if the read is dropped. Updates summary counters.
+    """
+    keep = len(seq)
+    
+    if settings["adapter_trimming"]:
+        adapter_pos = find_adapter(seq.upper(), settings["adapter_min_overlap"])
+        if adapter_pos is not None:
+            summary["adapter_trimmed_reads"] += 1
+            summary["adapter_trimmed_bases"] += keep - adapter_pos
+            keep = adapter_pos
+    
+    if settings["quality_cutoff"] > 0:
+        trimmed = quality_trim_end(qualities[:keep], settings["quality_cutoff"])
+        if trimmed < keep:
+            summary["quality_trimmed_reads"] += 1
+            summary["quality_trimmed_bases"] += keep - trimmed
+            keep = trimmed
+    
+    if keep < settings["min_length"]:
+        summary["dropped_too_short"] += 1
+        return None
+    n_count = seq.count("N", 0, keep) + seq.count("n", 0, keep)
+    if n_count > settings["max_n"]:
+        summary["dropped_too_many_n"] += 1
+        return None
+    return keep
+
+class CompressedFastqWriter:
+    """
+    Gzip FASTQ writer that compresses on a background thread.
+    Records are batched into chunks (1 MB by default); zlib releases the GIL
+    while compressing, so parsing continues in parallel with compression.
+    """
+
+    def __init__(self, output_path, compress_level=6, chunk_size=1 << 20, queue_chunks=8):
+        self._handle = gzip.open(output_path, "wb", compresslevel=compress_level)
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=queue_chunks)
+        self._pending = []
+        self._pending_size = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is None:
+                try:
+                    self._handle.write(chunk)
+                except Exception as e:
+                    self._error = e
+
+    def write(self, header, seq, quality_str):
+        record = f"@{header}\n{seq}\n+\n{quality_str}\n"
+        self._pending.append(record)
+        self._pending_size += len(record)
+        if self._pending_size >= self._chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self._error is not None:
+            raise self._error
+        if self._pending:
+            self._queue.put("".join(self._pending).encode("ascii"))
+            self._pending = []
+            self._pending_size = 0
+
+    def close(self):
+        try:
+            self._flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            self._handle.close()
+        if self._error is not None:
+            raise self._error
+
+def position_bins(n_positions):
+    """FastQC-style position bins: 1-9 at single-base resolution, then 5bp windows.
+
+    Yields (start, end, label) with 0-based, end-exclusive indices.
+    """
+    current_pos = 0
+    while current_pos < n_positions:
+        if current_pos < 9:
+            end_pos = current_pos + 1
+            label = str(current_pos + 1)
+        else:
+            end_pos = min(current_pos + 5, n_positions)
+            label = f"{current_pos + 1}-{end_pos}"
+        yield current_pos, end_pos, label
+        current_pos = end_pos
+
+def detect_platform(first_line, avg_read_length):
+    """Guess the sequencing platform from the first read header line."""
+    platform = "Unknown"
+    try:
+        if "runid=" in first_line or "ch=" in first_line:
+            platform = "Nanopore"
+        elif first_line.endswith("/ccs") or first_line.startswith("@m"):
+            platform = "PacBio"
+        elif first_line.startswith("@V") or first_line.startswith("@E") or first_line.startswith("@CL"):
+            # Heuristic for MGI/DNBSEQ (often start with V, E, or CL)
+            if avg_read_length < 1000:
+                platform = "MGI"
+            else:
+                platform = "Long Read (Unknown)"
+        elif first_line.count(":") >= 4:
+            # Standard Illumina header has many colons
+            platform = "Illumina"
+        else:
+            # Fallback based on length
+            if avg_read_length > 1000:
+                platform = "Long Read"
+            else:
+                platform = "Short Read"
+                
+    except Exception:
+        platform = "Unknown"
+    return platform
+
+def analyze_fastq(file_path, output_path=None, filter_settings=None, max_memory=None, baseline_rss=None):
+    """
+    Compute QC metrics for a FASTQ file in a single pass.
+
+    If output_path is given, each read is also adapter/quality trimmed and
+    length/N filtered (filter_settings overrides DEFAULT_FILTER_SETTINGS) and
+    the kept reads are streamed to a gzip FASTQ. The result then carries an
+    "after_filter" metrics block and a "filter_summary" alongside the
+    original (before-filter) metrics.
+
+    max_memory (bytes) sizes every accumulator through MemoryGovernor; the
+    applied limits, RSS and any accuracy degradation are reported under "memory".
+    baseline_rss is the process baseline the budget is sized against; it is
+    measured now if not given.
+    """
+    governor = MemoryGovernor(max_memory, accumulators=2 if output_path else 1, baseline_rss=baseline_rss)
+    stats = new_stats(governor.limits)
+    stats_list = [stats]
+    first_header = None
+    
+    filtered_stats = None
+    writer = None
+    settings = None
+    summary = None
+    if output_path:
+        settings = dict(DEFAULT_FILTER_SETTINGS)
+        settings.update(filter_settings or {})
+        filtered_stats = new_stats(governor.limits)
+        stats_list.append(filtered_stats)
+        summary = {
+            "reads_in": 0,
+            "reads_out": 0,
+            "adapter_trimmed_reads": 0,
+            "adapter_trimmed_bases": 0,
+            "quality_trimmed_reads": 0,
+            "quality_trimmed_bases": 0,
+            "dropped_too_short": 0,
+            "dropped_too_many_n": 0
+        }
 
     try:
         # Open file handle here so we can access it for progress
@@ -56,68 +451,35 @@ def analyze_fastq(file_path):
             handle = open(file_path, "r")
 
         try:
+            if output_path:
+                writer = CompressedFastqWriter(output_path, settings["compress_level"],
+                                               governor.limits["writer_chunk_bytes"],
+                                               governor.limits["writer_queue_chunks"])
+
             for record in SeqIO.parse(handle, "fastq"):
-                stats["total_reads"] += 1
-                seq_len = len(record.seq)
-                stats["total_bases"] += seq_len
-                
-                # Length stats
-                if seq_len < stats["min_len"]: stats["min_len"] = seq_len
-                if seq_len > stats["max_len"]: stats["max_len"] = seq_len
-                
-                len_bin = (seq_len // 10) * 10
-                stats["length_distribution"][len_bin] = stats["length_distribution"].get(len_bin, 0) + 1
-                
-                # Collect read lengths for N50 (limit to first 100k reads for memory)
-                if len(stats["read_lengths"]) < 100000:
-                    stats["read_lengths"].append(seq_len)
-    
-                # GC Content
-                gc_count = record.seq.count("G") + record.seq.count("C")
-                stats["gc_count"] += gc_count
-    
-                # Quality Scores
+                seq = str(record.seq)
                 qualities = record.letter_annotations["phred_quality"]
-                stats["q_score_sum"] += sum(qualities)
-    
-                # Per position quality (limit to first 200bp for performance/size)
-                for i, q in enumerate(qualities[:200]):
-                    stats["quality_distribution"][i] = stats["quality_distribution"].get(i, 0) + q
-                    stats["quality_counts"][i] = stats["quality_counts"].get(i, 0) + 1
-                
-                # --- New Metrics Calculation ---
+                if first_header is None:
+                    first_header = "@" + record.description
+                read_info = parse_read_header(record.description)
+                tile = f"{read_info[1]}:{read_info[2]}" if read_info is not None else None
+                accumulate_record(stats, seq, qualities, tile)
                 
-                # Per Sequence Quality
-                if len(qualities) > 0:
-                    mean_q = int(sum(qualities) / len(qualities))
-                    stats["per_sequence_quality"][mean_q] = stats["per_sequence_quality"].get(mean_q, 0) + 1
-
-                # Per Sequence GC
-                if seq_len > 0:
-                    gc_pct = int((gc_count / seq_len) * 100)
-                    stats["per_sequence_gc"][gc_pct] = stats["per_sequence_gc"].get(gc_pct, 0) + 1
-
-                # Per Base Content (limit to first 200bp)
-                seq_str = str(record.seq).upper()
-                for i, char in enumerate(seq_str[:200]):
-                    if i not in stats["per_base_content"]:
-                        stats["per_base_content"][i] = {'A':0, 'T':0, 'G':0, 'C':0, 'N':0}
-                    if char in stats["per_base_content"][i]:
-                        stats["per_base_content"][i][char] += 1
+                # Pass-through filter: trim, filter and write the kept read
+                if writer is not None:
+                    summary["reads_in"] += 1
+                    keep = filter_record(seq, qualities, settings, summary)
+                    if keep is not None:
+                        summary["reads_out"] += 1
+                        kept_seq = seq[:keep]
+                        kept_qualities = qualities[:keep]
+                        accumulate_record(filtered_stats, kept_seq, kept_qualities, tile)
+                        writer.write(record.description, kept_seq,
+                                     "".join(chr(q + 33) for q in kept_qualities))
                 
-                # Duplication (limit memory usage: track first 100k unique sequences)
-                # If we have too many unique sequences, stop tracking to avoid OOM
-                if len(stats["sequence_duplication"]) < 100000:
-                    stats["sequence_duplication"][seq_str] = stats["sequence_duplication"].get(seq_str, 0) + 1
-                elif seq_str in stats["sequence_duplication"]:
-                    # Still count if we already tracking it
-                    stats["sequence_duplication"][seq_str] += 1
-                
-                # Adapter Content (check first 100k reads only for speed)
-                if stats["total_reads"] <= 100000:
-                    for name, seq in adapters.items():
-                        if seq in seq_str:
-                            stats["adapter_content"][name] = stats["adapter_content"].get(name, 0) + 1
+                # Memory check
+                if stats["total_reads"] % RSS_CHECK_INTERVAL == 0:
+                    governor.check(stats_list, stats["total_reads"])
                 
                 # Progress update
                 if stats["total_reads"] % 1000 == 0:
@@ -153,12 +515,30 @@ def analyze_fastq(file_path):
                         sys.stderr.flush()
         finally:
             handle.close()
+            if writer is not None:
+                writer.close()
 
     except Exception as e:
         return {"error": str(e)}
 
-    # Finalize stats
+    platform = "Unknown"
     if stats["total_reads"] > 0:
+        platform = detect_platform(first_header, stats["total_bases"] / stats["total_reads"])
+
+    result = finalize_stats(stats, file_path, platform)
+    result["memory"] = governor.report(stats_list)
+    if output_path:
+        settings.pop("compress_level", None)
+        summary["output_path"] = output_path
+        summary["settings"] = settings
+        result["filter_summary"] = summary
+        result["after_filter"] = finalize_stats(filtered_stats, output_path, platform)
+    return result
+
+def finalize_stats(stats, file_path, platform):
+    """Turn an accumulator into the result dict sent to the frontend."""
+    # Finalize stats
+    if stats["total_reads"] > 0 and stats["total_bases"] > 0:
         avg_read_length = stats["total_bases"] / stats["total_reads"]
         gc_content = (stats["gc_count"] / stats["total_bases"]) * 100
         avg_q_score = stats["q_score_sum"] / stats["total_bases"]
@@ -232,17 +612,7 @@ def analyze_fastq(file_path):
     max_pos = max(stats.get("per_base_content", {}).keys()) if stats.get("per_base_content") else -1
     
     # Define bins: 1-9 (1bp), then 5bp windows
-    current_pos = 0
-    while current_pos <= max_pos:
-        if current_pos < 9:
-            # Single base resolution for first 9 bases (0-8 index)
-            end_pos = current_pos + 1
-            label = str(current_pos + 1)
-        else:
-            # 5bp bins
-            end_pos = min(current_pos + 5, max_pos + 1)
-            label = f"{current_pos + 1}-{end_pos}"
-            
+    for current_pos, end_pos, label in position_bins(max_pos + 1):
         # Aggregate counts for this bin
         bin_counts = {'A':0, 'T':0, 'G':0, 'C':0, 'N':0}
         bin_total = 0
@@ -262,8 +632,6 @@ def analyze_fastq(file_path):
                 "C": (bin_counts['C'] / bin_total) * 100,
                 "N": (bin_counts['N'] / bin_total) * 100
             })
-            
-        current_pos = end_pos
 
     # Sequence Duplication Levels
     # Group by duplication count (1, 2, 3, 4, 5, 6-10, 11-50, 51-100, 100+)
@@ -291,11 +659,18 @@ def analyze_fastq(file_path):
             elif count <= 50: duplication_levels["11-50"] += 1
             elif count <= 100: duplication_levels["51-100"] += 1
             else: duplication_levels["100+"] += 1
+    
+    # Singletons dropped under memory pressure still count as unique sequences
+    dropped_singletons = stats.get("dropped_singletons", 0)
+    duplication_levels["1"] += dropped_singletons
+    total_deduplicated += dropped_singletons
+    total_sequences_checked += dropped_singletons
 
+    # Nothing tracked (e.g. a memory budget below the baseline): unavailable, not 0%
     duplication_dist = [
-        {"level": k, "percentage": (v / total_deduplicated * 100) if total_deduplicated > 0 else 0}
+        {"level": k, "percentage": v / total_deduplicated * 100}
         for k, v in duplication_levels.items()
-    ]
+    ] if total_deduplicated > 0 else []
     
     # Overrepresented Sequences (Top 5)
     overrepresented_seqs = []
@@ -314,6 +689,62 @@ def analyze_fastq(file_path):
                         "possible_source": "Unknown" # We don't have a database of contaminants yet
                     })
 
+    # Per Tile Quality (FastQC-style: deviation of each tile's mean from the
+    # all-tile mean at each position) and per-lane summary
+    per_tile_quality = None
+    per_lane_quality = []
+    _flush_tile_batches(stats)
+    n_tiles = len(stats["tile_index"])
+    if n_tiles > 0:
+        tile_sums = stats["tile_quality_sum"][:n_tiles]
+        length_counts = stats["tile_length_counts"][:n_tiles]
+        # Reads covering position i are those with length > i
+        tile_counts = np.cumsum(length_counts[:, ::-1], axis=1)[:, ::-1][:, 1:]
+        position_counts = tile_counts.sum(axis=0)
+        n_positions = int(np.count_nonzero(position_counts))
+        
+        if n_positions > 0:
+            tile_sums = tile_sums[:, :n_positions]
+            tile_counts = tile_counts[:, :n_positions]
+            # Same bins as Per Base Sequence Content so the output stays
+            # tiles x ~(9 + length/5) rather than tiles x read length
+            bins = list(position_bins(n_positions))
+            starts = [start for start, _, _ in bins]
+            bin_sums = np.add.reduceat(tile_sums, starts, axis=1)
+            bin_counts = np.add.reduceat(tile_counts, starts, axis=1)
+            overall_mean = bin_sums.sum(axis=0) / bin_counts.sum(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                deviation = bin_sums / bin_counts - overall_mean
+            
+            def tile_sort_key(key):
+                lane, tile = key.split(":", 1)
+                return (int(lane), len(tile), tile)
+            
+            ordered = sorted(stats["tile_index"], key=tile_sort_key)
+            per_tile_quality = {
+                "tiles": ordered,
+                "positions": [label for _, _, label in bins],
+                "deviation": [
+                    [round(float(v), 2) if np.isfinite(v) else None for v in deviation[stats["tile_index"][key]]]
+                    for key in ordered
+                ]
+            }
+            
+            lanes = {}
+            for key in ordered:
+                row = stats["tile_index"][key]
+                lane = key.split(":", 1)[0]
+                entry = lanes.setdefault(lane, {"lane": lane, "tiles": 0, "reads": 0, "quality_sum": 0, "bases": 0})
+                entry["tiles"] += 1
+                entry["reads"] += int(length_counts[row].sum())
+                entry["quality_sum"] += int(tile_sums[row].sum())
+                entry["bases"] += int(tile_counts[row].sum())
+            for entry in lanes.values():
+                bases = entry.pop("bases")
+                quality_sum = entry.pop("quality_sum")
+                entry["mean_quality"] = quality_sum / bases if bases > 0 else 0
+                per_lane_quality.append(entry)
+
     # Adapter Content
     adapter_content = []
     if "adapter_content" in stats:
@@ -323,42 +754,6 @@ def analyze_fastq(file_path):
                 "percentage": (count / stats["total_reads"]) * 100
             })
 
-    # Platform Detection Logic
-    platform = "Unknown"
-    if stats["total_reads"] > 0:
-        # Check first read header for patterns
-        try:
-            # Re-open file briefly to check header
-            if file_path.endswith('.gz'):
-                with gzip.open(file_path, "rt") as f:
-                    first_line = f.readline().strip()
-            else:
-                with open(file_path, "r") as f:
-                    first_line = f.readline().strip()
-            
-            if "runid=" in first_line or "ch=" in first_line:
-                platform = "Nanopore"
-            elif first_line.endswith("/ccs") or first_line.startswith("@m"):
-                platform = "PacBio"
-            elif first_line.startswith("@V") or first_line.startswith("@E") or first_line.startswith("@CL"):
-                # Heuristic for MGI/DNBSEQ (often start with V, E, or CL)
-                if avg_read_length < 1000:
-                    platform = "MGI"
-                else:
-                    platform = "Long Read (Unknown)"
-            elif first_line.count(":") >= 4:
-                # Standard Illumina header has many colons
-                platform = "Illumina"
-            else:
-                # Fallback based on length
-                if avg_read_length > 1000:
-                    platform = "Long Read"
-                else:
-                    platform = "Short Read"
-                    
-        except Exception:
-            platform = "Unknown"
-
     # ============================================
     # QUALITY ASSESSMENT (FastQC-style Pass/Warn/Fail)
     # ============================================
@@ -452,13 +847,15 @@ def analyze_fastq(file_path):
         # Pass: < 20% sequences are duplicates
         # Warn: 20-50% duplicates
         # Fail: > 50% duplicates
-        total_dup = sum(d["percentage"] for d in duplication_dist if d["level"] != "1") if duplication_dist else 0
-        if total_dup < 20:
-            status["sequence_duplication"] = {"status": "pass", "message": f"Low duplication ({total_dup:.1f}%)"}
-        elif total_dup < 50:
-            status["sequence_duplication"] = {"status": "warn", "message": f"Moderate duplication ({total_dup:.1f}%)"}
-        else:
-            status["sequence_duplication"] = {"status": "fail", "message": f"High duplication ({total_dup:.1f}%)"}
+        # Skipped when duplication was not tracked
+        if duplication_dist:
+            total_dup = sum(d["percentage"] for d in duplication_dist if d["level"] != "1")
+            if total_dup < 20:
+                status["sequence_duplication"] = {"status": "pass", "message": f"Low duplication ({total_dup:.1f}%)"}
+            elif total_dup < 50:
+                status["sequence_duplication"] = {"status": "warn", "message": f"Moderate duplication ({total_dup:.1f}%)"}
+            else:
+                status["sequence_duplication"] = {"status": "fail", "message": f"High duplication ({total_dup:.1f}%)"}
         
         # 7. Adapter content
         # Pass: < 5% adapter at all positions
@@ -479,6 +876,22 @@ def analyze_fastq(file_path):
         else:
             status["adapter_content"] = {"status": "pass", "message": "No adapters detected"}
         
+        # 8. Per tile quality (only when read headers carry tile information)
+        # Pass: No tile deviates more than 5 below the mean at any position
+        # Warn: Deviation below -5
+        # Fail: Deviation below -10
+        if per_tile_quality:
+            worst = min(
+                (v for row in per_tile_quality["deviation"] for v in row if v is not None),
+                default=0
+            )
+            if worst >= -5:
+                status["per_tile_quality"] = {"status": "pass", "message": "All tiles have consistent quality"}
+            elif worst >= -10:
+                status["per_tile_quality"] = {"status": "warn", "message": f"Some tiles have lower quality (min deviation: {worst:.1f})"}
+            else:
+                status["per_tile_quality"] = {"status": "fail", "message": f"Some tiles have poor quality (min deviation: {worst:.1f})"}
+        
         # Calculate overall status
         statuses = [s["status"] for s in status.values()]
         if "fail" in statuses:
@@ -526,6 +939,8 @@ def analyze_fastq(file_path):
         "duplication_levels": duplication_dist,
         "overrepresented_sequences": overrepresented_seqs,
         "adapter_content": adapter_content,
+        "per_tile_quality": per_tile_quality,
+        "per_lane_quality": per_lane_quality,
         "quality_status": quality_status
     }
 
@@ -534,6 +949,26 @@ if __name__ == "__main__":
         print(json.dumps({"error": "No file path provided"}))
         sys.exit(1)
     
-    file_path = sys.argv[1]
-    result = analyze_fastq(file_path)
+    parser = argparse.ArgumentParser(description='OmniQC FASTQ Analyzer')
+    parser.add_argument('file_path', help='FASTQ file (.fastq or .fastq.gz)')
+    parser.add_argument('--filter_output', help='Write trimmed/filtered reads to this .fastq.gz while analyzing')
+    parser.add_argument('--quality_cutoff', type=int, default=DEFAULT_FILTER_SETTINGS["quality_cutoff"], help="3' quality trimming threshold (0 disables)")
+    parser.add_argument('--no_adapter_trimming', action='store_true', help='Disable adapter clipping')
+    parser.add_argument('--adapter_min_overlap', type=int, default=DEFAULT_FILTER_SETTINGS["adapter_min_overlap"], help="Minimum partial adapter overlap clipped at the 3' end")
+    parser.add_argument('--min_length', type=int, default=DEFAULT_FILTER_SETTINGS["min_length"], help='Minimum read length after trimming')
+    parser.add_argument('--max_n', type=int, default=DEFAULT_FILTER_SETTINGS["max_n"], help='Maximum N bases per read')
+    parser.add_argument('--compress_level', type=int, default=DEFAULT_FILTER_SETTINGS["compress_level"], help='gzip level for the filtered output')
+    parser.add_argument('--max_memory', type=parse_size, help='Memory budget for the analysis (e.g. 512M, 2G)')
+    args = parser.parse_args()
+    
+    filter_settings = {
+        "quality_cutoff": args.quality_cutoff,
+        "adapter_trimming": not args.no_adapter_trimming,
+        "adapter_min_overlap": args.adapter_min_overlap,
+        "min_length": args.min_length,
+        "max_n": args.max_n,
+        "compress_level": args.compress_level
+    }
+    result = analyze_fastq(args.file_path, output_path=args.filter_output, filter_settings=filter_settings,
+                           max_memory=args.max_memory)
     print(json.dumps(result))
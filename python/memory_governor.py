@@ -0,0 +1,181 @@
+import ctypes
+import os
+import sys
+
+# Limits used when no memory budget is given (the historical hard-coded values)
+DEFAULT_LIMITS = {
+    "max_unique_sequences": 100000,
+    "max_duplication_bytes": None,
+    "max_read_lengths": 100000,
+    "max_positions": 200,
+    "adapter_sample_reads": 100000,
+    "max_tiles": 4096,
+    "tile_batch_size": 8192,
+    "writer_chunk_bytes": 1 << 20,
+    "writer_queue_chunks": 8
+}
+
+# Approximate CPython cost per accumulator entry, including the temporary
+# copies made while finalizing (e.g. sorting the duplication counter)
+DUPLICATION_ENTRY_OVERHEAD = 230   # dict slot + str header + count + sort tuple; plus len(seq)
+READ_LENGTH_ENTRY_BYTES = 48       # list slot + int + sorted copy
+TILE_BATCH_ENTRY_OVERHEAD = 41     # bytes header + list slot; plus positions
+
+# Share of the budget left after the interpreter baseline, per accumulator
+BUDGET_SHARES = {
+    "sequence_duplication": 0.55,
+    "read_lengths": 0.10,
+    "tiles": 0.10,
+    "io_buffers": 0.10
+    # remaining 15% is headroom for the parser and per-read temporaries
+}
+
+# Reported when an accumulator hits its limit
+LIMIT_MESSAGES = {
+    "sequence_duplication": "unique sequence limit reached; new sequences after this read are not tracked",
+    "read_lengths": "read length limit reached; N50 is estimated from the reads before this one",
+    "tiles": "tile limit reached; reads from further tiles are not tile-tracked"
+}
+
+# How often (in reads) the governor samples RSS
+RSS_CHECK_INTERVAL = 10000
+
+def parse_size(value):
+    """Parse a size such as '512M', '2G', '1.5GB' or a plain byte count."""
+    text = str(value).strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", ctypes.c_ulong),
+                    ("PageFaultCount", ctypes.c_ulong),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t)
+                ]
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        # macOS/BSD: only the peak is available (bytes on macOS)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+class MemoryGovernor:
+    """
+    Sizes the parser's accumulators to fit a memory budget and watches RSS
+    while a file is analyzed.
+
+    Without a budget the historical limits apply. With one, the budget left
+    after the interpreter baseline is split between accumulators; if RSS
+    still approaches the budget, duplication tracking is frozen and then its
+    singletons are dropped. Every limit hit and degradation step is reported.
+    """
+
+    def __init__(self, max_memory=None, accumulators=1, baseline_rss=None):
+        self.max_memory = max_memory
+        # Long-running callers pass the RSS measured at process start, so
+        # memory retained from earlier files does not shrink the budget
+        self.baseline_rss = baseline_rss if baseline_rss is not None else current_rss()
+        self.peak_rss = self.baseline_rss
+        self.degraded = []
+        self._level = 0
+        self.limits = dict(DEFAULT_LIMITS)
+        if max_memory:
+            self._size_limits(accumulators)
+
+    def _size_limits(self, accumulators):
+        available = self.max_memory - (self.baseline_rss or 0)
+        if available <= 0:
+            self.record("all", "budget is below the interpreter baseline; using minimal limits")
+            available = 0
+        # Before- and after-filter accumulators share the budget
+        per_accumulator = available / accumulators
+        positions = self.limits["max_positions"]
+
+        dup_bytes = int(per_accumulator * BUDGET_SHARES["sequence_duplication"])
+        self.limits["max_duplication_bytes"] = dup_bytes
+        self.limits["max_unique_sequences"] = max(1000, dup_bytes // (DUPLICATION_ENTRY_OVERHEAD + 100))
+        self.limits["max_read_lengths"] = max(1000, int(per_accumulator * BUDGET_SHARES["read_lengths"]) // READ_LENGTH_ENTRY_BYTES)
+        # Two int64 arrays per tile, with up to 2x slack from growth by doubling
+        tile_bytes = 2 * (2 * positions + 1) * 8
+        self.limits["max_tiles"] = max(16, min(DEFAULT_LIMITS["max_tiles"], int(per_accumulator * BUDGET_SHARES["tiles"]) // tile_bytes))
+
+        io_bytes = available * BUDGET_SHARES["io_buffers"]
+        batch_entry = TILE_BATCH_ENTRY_OVERHEAD + positions
+        self.limits["tile_batch_size"] = max(256, min(DEFAULT_LIMITS["tile_batch_size"], int(io_bytes / 2 / accumulators) // batch_entry))
+        self.limits["writer_queue_chunks"] = 4
+        self.limits["writer_chunk_bytes"] = max(64 << 10, min(DEFAULT_LIMITS["writer_chunk_bytes"], int(io_bytes / 2) // (self.limits["writer_queue_chunks"] + 2)))
+
+    def record(self, metric, reason, at_read=None):
+        entry = {"metric": metric, "reason": reason}
+        if at_read is not None:
+            entry["at_read"] = at_read
+        self.degraded.append(entry)
+
+    def check(self, stats_list, reads):
+        """Sample RSS and degrade duplication tracking if the budget is at risk."""
+        rss = current_rss()
+        if rss is None:
+            return
+        if self.peak_rss is None or rss > self.peak_rss:
+            self.peak_rss = rss
+        if not self.max_memory:
+            return
+
+        if self._level == 0 and rss > 0.9 * self.max_memory:
+            # Stop admitting new sequences; existing ones keep counting
+            for stats in stats_list:
+                stats["limits"]["max_unique_sequences"] = len(stats["sequence_duplication"])
+            self._level = 1
+            self.record("sequence_duplication", f"RSS at {rss >> 20} MiB (over 90% of budget); stopped tracking new sequences", reads)
+        elif self._level == 1 and rss > self.max_memory:
+            # Drop sequences seen once but keep their count, so duplication
+            # levels stay a lower bound instead of collapsing to 100%
+            for stats in stats_list:
+                dup = stats["sequence_duplication"]
+                stats["sequence_duplication"] = {seq: count for seq, count in dup.items() if count > 1}
+                stats["dropped_singletons"] += len(dup) - len(stats["sequence_duplication"])
+                stats["limits"]["max_unique_sequences"] = len(stats["sequence_duplication"])
+            self._level = 2
+            self.record("sequence_duplication", f"RSS at {rss >> 20} MiB (over budget); dropped singleton sequences (still counted)", reads)
+
+    def report(self, stats_list):
+        """Applied limits, RSS and degradations for the result JSON."""
+        rss = current_rss()
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+        degraded = list(self.degraded)
+        for accumulator, stats in zip(("input", "after_filter"), stats_list):
+            for metric, at_read in stats["limits_hit"].items():
+                degraded.append({"metric": metric, "accumulator": accumulator,
+                                 "reason": LIMIT_MESSAGES[metric], "at_read": at_read})
+        return {
+            "max_memory": self.max_memory,
+            "baseline_rss": self.baseline_rss,
+            "peak_rss": self.peak_rss,
+            # As applied at the end of the run, including any lowered by check()
+            "limits": {accumulator: dict(stats["limits"])
+                       for accumulator, stats in zip(("input", "after_filter"), stats_list)},
+            "degraded": degraded
+        }
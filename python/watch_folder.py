@@ -0,0 +1,310 @@
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+
+import database
+from fastq_parser import analyze_fastq
+from memory_governor import current_rss, parse_size
+
+FASTQ_EXTENSIONS = ('.fastq', '.fq', '.fastq.gz', '.fq.gz')
+
+# Serializes event lines written by the watcher and the analysis worker
+_emit_lock = threading.Lock()
+
+def emit(event, **data):
+    """Write a watcher event line to stdout for Electron (prefixed like PROGRESS:)."""
+    with _emit_lock:
+        sys.stdout.write("WATCH:" + json.dumps({"event": event, **data}) + "\n")
+        sys.stdout.flush()
+
+def is_fastq(path):
+    return path.lower().endswith(FASTQ_EXTENSIONS)
+
+class InotifyBackend:
+    """
+    Linux inotify via ctypes (no extra dependency). Watches every directory
+    under the roots and adds watches for directories created later.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    # No IN_MODIFY: it fires per write and would spin the loop at write rate.
+    # Files still being written are re-checked by stat every interval.
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, roots):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches = {}
+        for root in roots:
+            self._add_tree(root)
+
+    def _add_tree(self, root):
+        """Watch root and its subdirectories; returns the files already inside."""
+        found = []
+        for dirpath, _, filenames in os.walk(root):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), self.WATCH_MASK)
+            if wd >= 0:
+                self._watches[wd] = dirpath
+            found.extend(os.path.join(dirpath, f) for f in filenames)
+        return found
+
+    def wait(self, timeout):
+        """
+        Block up to timeout seconds. Returns the paths that changed, or None
+        if the kernel queue overflowed and the caller should rescan.
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        changed = []
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, name_len = self.EVENT_HEADER.unpack_from(buf, offset)
+                offset += self.EVENT_HEADER.size
+                name = buf[offset:offset + name_len].rstrip(b'\0')
+                offset += name_len
+                if mask & self.IN_Q_OVERFLOW:
+                    return None
+                directory = self._watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        changed.extend(self._add_tree(path))
+                else:
+                    changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingBackend:
+    """Fallback for platforms without inotify: the caller rescans every interval."""
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return None
+
+    def close(self):
+        pass
+
+def make_backend(roots):
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyBackend(roots)
+        except (OSError, AttributeError) as e:
+            sys.stderr.write(f"inotify unavailable, falling back to polling: {e}\n")
+            sys.stderr.flush()
+    return PollingBackend()
+
+class FolderWatcher:
+    """
+    Watches run folders for FASTQ files, registers completed files into a
+    project in bulk and queues them for analysis.
+
+    A file is complete when a marker file (e.g. CopyComplete.txt) exists in
+    its directory or any parent up to the watched root, or, without a
+    marker, when its size and mtime have not changed for stable_seconds.
+    Samples still pending from an earlier run are queued again on start.
+    """
+
+    def __init__(self, project_id, roots, stable_seconds=30, marker=None, interval=5, analyze=True, max_memory=None):
+        self.project_id = project_id
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.stable_seconds = stable_seconds
+        self.marker = marker
+        self.interval = interval
+        self.analyze = analyze
+        self.max_memory = max_memory
+        # Measured once so each file gets the same budget however much the
+        # process has retained from earlier analyses
+        self.baseline_rss = current_rss()
+        self._known = set()
+        self._pending = {}  # path -> (size, mtime, unchanged since)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+
+    def _root_for(self, path):
+        for root in self.roots:
+            if path == root or path.startswith(root + os.sep):
+                return root
+        return None
+
+    def _marker_present(self, path, cache):
+        root = self._root_for(path)
+        directory = os.path.dirname(path)
+        while True:
+            if directory not in cache:
+                cache[directory] = os.path.exists(os.path.join(directory, self.marker))
+            if cache[directory]:
+                return True
+            if root is None or directory == root or len(directory) <= len(root):
+                return False
+            directory = os.path.dirname(directory)
+
+    def _consider(self, path):
+        if is_fastq(path) and path not in self._known and path not in self._pending:
+            self._pending[path] = (-1, -1, time.monotonic())
+
+    def _scan(self):
+        for root in self.roots:
+            for dirpath, _, filenames in os.walk(root):
+                for f in filenames:
+                    self._consider(os.path.join(dirpath, f))
+
+    def _collect_complete(self):
+        now = time.monotonic()
+        marker_cache = {}
+        complete = []
+        for path, (size, mtime, since) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Removed or renamed before it finished
+                del self._pending[path]
+                continue
+            if self.marker:
+                # The marker is authoritative; a stalled copy must not count
+                if self._marker_present(path, marker_cache):
+                    complete.append(path)
+            elif (st.st_size, st.st_mtime) != (size, mtime):
+                self._pending[path] = (st.st_size, st.st_mtime, now)
+            elif st.st_size > 0 and now - since >= self.stable_seconds:
+                complete.append(path)
+        for path in complete:
+            del self._pending[path]
+            self._known.add(path)
+        return complete
+
+    def _register(self, paths):
+        # One transaction per batch; add_samples skips paths already in the project
+        result = database.add_samples(self.project_id, sorted(paths))
+        if result["status"] != "success":
+            emit("error", message=result["message"], paths=paths)
+            return
+        if result["data"]:
+            emit("registered", samples=result["data"])
+        if self.analyze:
+            for sample in result["data"]:
+                self._queue.put(sample)
+
+    def _resume_pending(self):
+        """
+        Queue samples under the watched roots that were registered but not
+        analyzed before the last stop; they stay 'pending' in the database.
+        """
+        result = database.get_pending_samples(self.project_id)
+        if result["status"] != "success":
+            emit("error", message=result["message"])
+            return
+        for sample in result["data"]:
+            path = sample["filepath"]
+            if self._root_for(path) is None:
+                continue
+            self._known.add(path)
+            if self.analyze:
+                self._queue.put(sample)
+
+    def _analysis_worker(self):
+        while True:
+            sample = self._queue.get()
+            # On stop, leave queued samples pending; the next start resumes them
+            if sample is None or self._stop.is_set():
+                break
+            emit("analyzing", sample_id=sample["id"], filepath=sample["filepath"])
+            # One bad file must not stop the worker: store the error so the
+            # sample leaves 'pending' (and is not resumed on every start)
+            try:
+                result = analyze_fastq(sample["filepath"], max_memory=self.max_memory, baseline_rss=self.baseline_rss)
+            except Exception as e:
+                result = {"error": str(e)}
+            try:
+                saved = database.update_sample(sample["id"], result)
+            except Exception as e:
+                saved = {"status": "error", "message": str(e)}
+            if saved["status"] != "success":
+                emit("error", sample_id=sample["id"], message=saved["message"])
+            elif "error" in result:
+                emit("error", sample_id=sample["id"], message=result["error"], sample=saved["data"])
+            else:
+                emit("analyzed", sample=saved["data"])
+
+    def run(self):
+        backend = make_backend(self.roots)
+        worker = threading.Thread(target=self._analysis_worker, daemon=True)
+        worker.start()
+        emit("started", project_id=self.project_id, roots=self.roots,
+             backend="inotify" if isinstance(backend, InotifyBackend) else "polling")
+        try:
+            self._resume_pending()
+            self._scan()
+            while not self._stop.is_set():
+                complete = self._collect_complete()
+                if complete:
+                    self._register(complete)
+                changed = backend.wait(self.interval)
+                if changed is None:
+                    self._scan()
+                else:
+                    for path in changed:
+                        self._consider(path)
+        finally:
+            backend.close()
+            self._stop.set()
+            self._queue.put(None)
+            worker.join()
+
+    def stop(self):
+        self._stop.set()
+
+def main():
+    parser = argparse.ArgumentParser(description='OmniQC Watch Folder')
+    parser.add_argument('folders', nargs='+', help='Run folders to watch')
+    parser.add_argument('--project_id', type=int, required=True, help='Project to register new samples into')
+    parser.add_argument('--stable_seconds', type=float, default=30, help='Seconds a file size must stay unchanged to count as complete (ignored with --marker)')
+    parser.add_argument('--marker', help='Completion marker file name (e.g. CopyComplete.txt)')
+    parser.add_argument('--interval', type=float, default=5, help='Check/poll interval in seconds')
+    parser.add_argument('--no_analyze', action='store_true', help='Register files without analyzing them')
+    parser.add_argument('--max_memory', type=parse_size, help='Memory budget per analysis (e.g. 512M, 2G)')
+    args = parser.parse_args()
+
+    missing = [f for f in args.folders if not os.path.isdir(f)]
+    if missing:
+        print(json.dumps({"status": "error", "message": f"Not a directory: {', '.join(missing)}"}))
+        sys.exit(1)
+
+    watcher = FolderWatcher(args.project_id, args.folders, stable_seconds=args.stable_seconds,
+                            marker=args.marker, interval=args.interval, analyze=not args.no_analyze,
+                            max_memory=args.max_memory)
+    # Electron stops the daemon with SIGTERM; finish the current file and exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    # Ensure DB exists
+    database.init_db()
+    main()
@@ -113,8 +113,15 @@ function App() {
         setSelectedSample(null)
     }
 
-    const handleSampleSelect = (sample) => {
-        setSelectedSample(sample)
+    const handleSampleSelect = async (sample) => {
+        // Project lists only carry summary results; fetch the full analysis for the dashboard
+        try {
+            const res = await window.electronAPI.getSample(sample.id)
+            setSelectedSample(res.status === 'success' ? res.data : sample)
+        } catch (err) {
+            console.error("Failed to load sample:", err)
+            setSelectedSample(sample)
+        }
         setActiveSidebarTab('analysis')
     }
 
@@ -1,9 +1,54 @@
-import React, { useRef, useState } from 'react'
+import React, { useEffect, useRef, useState } from 'react'
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, LineChart, Line, Legend } from 'recharts'
 import { Download, FileText, Loader2 } from 'lucide-react'
 import jsPDF from 'jspdf'
 import html2canvas from 'html2canvas'
 
+// Per tile heatmap color: blue at/above the mean, shading to red at -10 (FastQC scale)
+const tileColor = (deviation) => {
+    if (deviation === null || deviation === undefined) return '#f1f5f9'
+    const t = Math.min(1, Math.max(0, -deviation / 10))
+    return `hsl(${220 - t * 220}, 75%, ${55 - t * 5}%)`
+}
+
+// Draws one pixel per tile/position bin and lets CSS scale it up, so large
+// flow cells don't become tens of thousands of DOM nodes
+const TileHeatmap = ({ data, height }) => {
+    const canvasRef = useRef(null)
+
+    useEffect(() => {
+        const canvas = canvasRef.current
+        if (!canvas) return
+        canvas.width = data.positions.length
+        canvas.height = data.tiles.length
+        const ctx = canvas.getContext('2d')
+        data.deviation.forEach((row, tileIdx) => {
+            row.forEach((value, posIdx) => {
+                ctx.fillStyle = tileColor(value)
+                ctx.fillRect(posIdx, tileIdx, 1, 1)
+            })
+        })
+    }, [data])
+
+    // Single tooltip for the cell under the cursor
+    const handleMouseMove = (e) => {
+        const rect = e.currentTarget.getBoundingClientRect()
+        const posIdx = Math.min(data.positions.length - 1, Math.floor((e.clientX - rect.left) / rect.width * data.positions.length))
+        const tileIdx = Math.min(data.tiles.length - 1, Math.floor((e.clientY - rect.top) / rect.height * data.tiles.length))
+        const value = data.deviation[tileIdx]?.[posIdx]
+        e.currentTarget.title = `Tile ${data.tiles[tileIdx]}, position ${data.positions[posIdx]}: ${value === null || value === undefined ? 'no data' : value.toFixed(2)}`
+    }
+
+    return (
+        <canvas
+            ref={canvasRef}
+            className="flex-1 min-w-0"
+            style={{ height, width: '100%', imageRendering: 'pixelated' }}
+            onMouseMove={handleMouseMove}
+        />
+    )
+}
+
 const Dashboard = ({ sampleData }) => {
     const dashboardRef = useRef(null)
     const [isExportingPDF, setIsExportingPDF] = useState(false)
@@ -138,7 +183,8 @@ const Dashboard = ({ sampleData }) => {
                     gc_content: 'GC Content',
                     n_content: 'N Content',
                     sequence_duplication: 'Sequence Duplication',
-                    adapter_content: 'Adapter Content'
+                    adapter_content: 'Adapter Content',
+                    per_tile_quality: 'Per Tile Quality'
                 }
 
                 // Draw metrics table
@@ -496,6 +542,8 @@ const Dashboard = ({ sampleData }) => {
     const duplicationLevels = metrics.duplication_levels || []
     const overrepresented = metrics.overrepresented_sequences || []
     const adapterContent = metrics.adapter_content || []
+    const perTileQuality = metrics.per_tile_quality || null
+    const perLaneQuality = metrics.per_lane_quality || []
     const qualityStatus = metrics.quality_status || null
 
     // Helper function for status badge
@@ -700,6 +748,49 @@ const Dashboard = ({ sampleData }) => {
                     </div>
                 </div>
 
+                {/* Per Tile Sequence Quality */}
+                {perTileQuality && perTileQuality.tiles.length > 0 && (
+                    <div className="bg-white border border-slate-200 rounded-xl shadow-sm overflow-hidden">
+                        <ChartHeader title="Per Tile Sequence Quality" metricKey="per_tile_quality" />
+                        <div className="p-6">
+                            <div className="flex gap-2">
+                                <div className="flex flex-col justify-between text-[10px] text-slate-500 font-mono" style={{ height: Math.min(400, Math.max(80, perTileQuality.tiles.length * 6)) }}>
+                                    <span>{perTileQuality.tiles[0]}</span>
+                                    {perTileQuality.tiles.length > 1 && <span>{perTileQuality.tiles[perTileQuality.tiles.length - 1]}</span>}
+                                </div>
+                                <TileHeatmap data={perTileQuality} height={Math.min(400, Math.max(80, perTileQuality.tiles.length * 6))} />
+                            </div>
+                            <div className="flex justify-between text-xs text-slate-500 mt-2">
+                                <span>Position 1</span>
+                                <span>Deviation from mean quality (blue: at mean, red: 10 below)</span>
+                                <span>Position {perTileQuality.positions[perTileQuality.positions.length - 1]}</span>
+                            </div>
+                            {perLaneQuality.length > 0 && (
+                                <table className="w-full text-left text-sm mt-6">
+                                    <thead className="bg-slate-50 text-slate-600 font-semibold border-b border-slate-200">
+                                        <tr>
+                                            <th className="px-6 py-3">Lane</th>
+                                            <th className="px-6 py-3">Tiles</th>
+                                            <th className="px-6 py-3">Reads</th>
+                                            <th className="px-6 py-3">Mean Quality</th>
+                                        </tr>
+                                    </thead>
+                                    <tbody className="divide-y divide-slate-100">
+                                        {perLaneQuality.map((lane) => (
+                                            <tr key={lane.lane} className="hover:bg-slate-50">
+                                                <td className="px-6 py-3 font-medium text-slate-800">{lane.lane}</td>
+                                                <td className="px-6 py-3 text-slate-800">{lane.tiles}</td>
+                                                <td className="px-6 py-3 text-slate-800">{lane.reads.toLocaleString()}</td>
+                                                <td className="px-6 py-3 text-slate-800">{lane.mean_quality.toFixed(2)}</td>
+                                            </tr>
+                                        ))}
+                                    </tbody>
+                                </table>
+                            )}
+                        </div>
+                    </div>
+                )}
+
                 {/* Per Sequence Quality Scores */}
                 {perSeqQuality.length > 0 && (
                     <div className="bg-white border border-slate-200 rounded-xl shadow-sm overflow-hidden">
@@ -1,20 +1,95 @@
-import React, { useState, useMemo } from 'react'
+import React, { useState, useMemo, useEffect, useRef } from 'react'
 import { FileText, Play, Trash2, Plus, Search, BarChart2, Activity, Dna } from 'lucide-react'
 
 const SampleList = ({ project, onSelectSample, onAnalyzeSample, onAddSample, onDeleteSample, analysisProgress, onAnalyzeAll }) => {
     const [searchTerm, setSearchTerm] = useState('')
+    const [debouncedSearch, setDebouncedSearch] = useState('')
+    const [filteredSamples, setFilteredSamples] = useState([])
+    const [nextCursor, setNextCursor] = useState(null)
+    const [isLoadingPage, setIsLoadingPage] = useState(false)
+    const requestId = useRef(0)
+
+    const PAGE_SIZE = 100
+    // Largest page query_samples accepts (MAX_PAGE_SIZE in database.py)
+    const MAX_QUERY_LIMIT = 1000
+
+    // Debounce search so typing doesn't spawn a query per keystroke
+    useEffect(() => {
+        const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), 250)
+        return () => clearTimeout(timer)
+    }, [searchTerm])
+
+    // Filtered, sorted pages come from the backend (query_samples). Without a
+    // cursor the list is replaced by the first `count` rows, fetched in chunks
+    // the backend accepts; with one, the next rows are appended
+    const loadPage = async (cursor, count = PAGE_SIZE) => {
+        if (!project) return
+        const currentRequest = cursor ? requestId.current : ++requestId.current
+        setIsLoadingPage(true)
+        try {
+            let rows = []
+            let next = cursor
+            do {
+                const res = await window.electronAPI.querySamples(project.id, {
+                    search: debouncedSearch,
+                    limit: Math.min(MAX_QUERY_LIMIT, count - rows.length),
+                    cursor: next
+                })
+                // Ignore responses for a superseded query
+                if (currentRequest !== requestId.current) return
+                if (res.status !== 'success') {
+                    console.error("Failed to query samples:", res.message)
+                    return
+                }
+                rows = rows.concat(res.data.samples)
+                next = res.data.next_cursor
+            } while (next && rows.length < count)
+            setFilteredSamples(prev => cursor ? [...prev, ...rows] : rows)
+            setNextCursor(next)
+        } catch (err) {
+            console.error("Failed to query samples:", err)
+        } finally {
+            if (currentRequest === requestId.current) setIsLoadingPage(false)
+        }
+    }
+
+    // Start from the first page when the project or the search changes
+    useEffect(() => {
+        loadPage(null)
+    }, [project?.id, debouncedSearch])
+
+    // Other refreshes (e.g. loadProjects after each analysis) keep the rows
+    // already loaded: patch them in place, or re-query as many rows as are
+    // loaded when samples were added or removed
+    const knownSamples = useRef({ projectId: null, ids: null })
+    useEffect(() => {
+        if (!project) return
+        const ids = new Set((project.samples || []).map(s => s.id))
+        const previous = knownSamples.current
+        knownSamples.current = { projectId: project.id, ids }
+        if (previous.projectId !== project.id || !previous.ids) return
+
+        const sameIds = previous.ids.size === ids.size && [...ids].every(id => previous.ids.has(id))
+        if (sameIds) {
+            const byId = new Map(project.samples.map(s => [s.id, s]))
+            setFilteredSamples(rows => rows.map(row => byId.get(row.id) || row))
+        } else {
+            loadPage(null, Math.max(PAGE_SIZE, filteredSamples.length))
+        }
+    }, [project?.samples])
+
+    // Fetch the next page when scrolled near the bottom
+    const handleScroll = (e) => {
+        const el = e.currentTarget
+        if (nextCursor && !isLoadingPage && el.scrollTop + el.clientHeight >= el.scrollHeight - 200) {
+            loadPage(nextCursor)
+        }
+    }
 
     if (!project) return null
 
     const samples = project.samples || []
 
-    // Filter samples based on search
-    const filteredSamples = useMemo(() => {
-        return samples.filter(sample =>
-            sample.filename.toLowerCase().includes(searchTerm.toLowerCase())
-        )
-    }, [samples, searchTerm])
-
     // Calculate aggregate stats
     const stats = useMemo(() => {
         let totalReads = 0
@@ -135,7 +210,7 @@ const SampleList = ({ project, onSelectSample, onAnalyzeSample, onAddSample, onD
                 </div>
             ) : (
                 <div className="flex-1 bg-white border border-slate-200 rounded-xl shadow-sm overflow-hidden flex flex-col">
-                    <div className="overflow-auto flex-1">
+                    <div className="overflow-auto flex-1" onScroll={handleScroll}>
                         <table className="w-full text-left text-sm">
                             <thead className="bg-slate-50 border-b border-slate-200 text-slate-600 font-semibold sticky top-0 z-10">
                                 <tr>
@@ -260,13 +335,20 @@ const SampleList = ({ project, onSelectSample, onAnalyzeSample, onAddSample, onD
                                             </tr>
                                         )
                                     })
-                                ) : (
+                                ) : !isLoadingPage && (
                                     <tr>
                                         <td colSpan="6" className="px-6 py-12 text-center text-slate-500">
                                             No samples found matching "{searchTerm}"
                                         </td>
                                     </tr>
                                 )}
+                                {isLoadingPage && (
+                                    <tr>
+                                        <td colSpan="6" className="px-6 py-4 text-center text-slate-400 text-xs">
+                                            Loading samples...
+                                        </td>
+                                    </tr>
+                                )}
                             </tbody>
                         </table>
                     </div>